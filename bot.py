@@ -1,17 +1,22 @@
 import os
+import re
+import asyncio
+import time
+from html import escape
+from collections import defaultdict, deque
+from typing import Dict
 from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, filters, 
-    ConversationHandler, ContextTypes, CallbackQueryHandler
+    ConversationHandler, ContextTypes, CallbackQueryHandler, AIORateLimiter
 )
 from dotenv import load_dotenv
-from product_tracker import ProductTracker
+from product_tracker import ProductTracker, TRENDYOL_URL_RE
 import logging
-from datetime import datetime, timedelta
+from datetime import time as dtime
 from functools import wraps
 import telegram
 import signal
-import sys
 
 # Configure logging
 logging.basicConfig(
@@ -27,89 +32,137 @@ TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 # Conversation states
 URL, SIZE = range(2)
 
+# Delete buttons carry d<id>; lists sent by older versions still carry delete_<id>
+DELETE_CALLBACK_RE = re.compile(r'^(?:d|delete_)(\d+)$')
+
 # Rate limiting settings
 RATE_LIMIT = 100  # requests per minute
 RATE_WINDOW = 60  # seconds
+STATS_FLUSH_INTERVAL = 60  # seconds between user_stats writes
+
+# Price history retention
+PRICE_HISTORY_KEEP_DAYS = 90
+PRICE_HISTORY_PRUNE_TIME = dtime(hour=4)  # UTC
+
+# Main menu shared by every reply that returns the user to it
+MAIN_KEYBOARD = [
+    ['🛍 Ürün Takibi Başlat', '📋 Takip Listesi'],
+    ['ℹ️ Yardım', '📊 Durum']
+]
+MAIN_REPLY_MARKUP = ReplyKeyboardMarkup(
+    MAIN_KEYBOARD,
+    resize_keyboard=True,
+    is_persistent=True,
+    one_time_keyboard=False
+)
+
+HELP_TEXT = (
+    "📌 Nasıl Kullanılır?\n\n"
+    "1. '🛍 Ürün Takibi Başlat' butonuna tıklayın\n"
+    "2. Trendyol ürün linkini yapıştırın\n"
+    "3. İstediğiniz bedeni seçin\n"
+    "🔍 Diğer Komutlar:\n"
+    "📋 Takip Listesi - Takip ettiğiniz ürünleri görün\n"
+    "📊 Durum - Bot durumunu kontrol edin"
+)
+
+# Telegram rejects messages over 4096 characters; leave room for edits
+MAX_MESSAGE_LENGTH = 3900
+
+class RateLimiter:
+    """Sliding-window request counter kept in memory, persisted lazily"""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._requests: Dict[int, deque] = defaultdict(deque)
+        self._pending: Dict[int, int] = defaultdict(int)
+
+    def allow(self, user_id: int) -> bool:
+        now = time.monotonic()
+        timestamps = self._requests[user_id]
+        while timestamps and now - timestamps[0] > self.window:
+            timestamps.popleft()
+        if len(timestamps) >= self.limit:
+            return False
+        timestamps.append(now)
+        self._pending[user_id] += 1
+        return True
+
+    def drain_pending(self) -> Dict[int, int]:
+        """Return request counts recorded since the last drain"""
+        pending, self._pending = self._pending, defaultdict(int)
+        # Forget users whose whole window has expired
+        now = time.monotonic()
+        for user_id in [u for u, t in self._requests.items() if not t or now - t[-1] > self.window]:
+            del self._requests[user_id]
+        return dict(pending)
 
 def rate_limit(func):
     @wraps(func)
     async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
-        user_id = update.effective_user.id
-        
         # Check rate limit
-        request_count = self.db.get_user_request_count(user_id, RATE_WINDOW)
-        if request_count >= RATE_LIMIT:
+        if not self.rate_limiter.allow(update.effective_user.id):
             await update.message.reply_text(
                 "⚠️ Çok fazla istek gönderdiniz. Lütfen 1 dakika bekleyin."
             )
             return
-        
-        # Update request count
-        try:
-            return await func(self, update, context, *args, **kwargs)
-        finally:
-            self.db.update_user_stats(user_id)
+
+        return await func(self, update, context, *args, **kwargs)
 
     return wrapper
 
 class ProductBot:
     def __init__(self):
-        self.product_tracker = ProductTracker(notification_callback=self.send_notification)
+        self.product_tracker = ProductTracker(notification_callback=self.dispatch_notification)
         self.application = None
+        # The application's event loop, set in post_init; the tracker notifies from its own thread
+        self._app_loop = None
         self.db = self.product_tracker.db
+        self.rate_limiter = RateLimiter(RATE_LIMIT, RATE_WINDOW)
+        self._stats_task = None
+        self._button_handlers = {
+            '🛍 Ürün Takibi Başlat': self.track,
+            '📋 Takip Listesi': self.list_products,
+            'ℹ️ Yardım': self.help,
+            '📊 Durum': self.status
+        }
         self.is_running = False
 
+    def dispatch_notification(self, user_id: int, message: str):
+        """Hand a tracker notification to the application loop so it goes out over the bot's connection pool"""
+        if self._app_loop is None or self._app_loop.is_closed():
+            logger.warning(f"Dropping notification for user {user_id}: bot is not running")
+            return
+        asyncio.run_coroutine_threadsafe(self.send_notification(user_id, message), self._app_loop)
+
     async def send_notification(self, user_id: int, message: str):
         if self.application:
             try:
-                keyboard = [
-                    ['🛍 Ürün Takibi Başlat', '📋 Takip Listesi'],
-                    ['ℹ️ Yardım', '📊 Durum']
-                ]
-                reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-                
                 await self.application.bot.send_message(
                     chat_id=user_id,
                     text=message,
                     parse_mode='HTML',
-                    reply_markup=reply_markup
+                    reply_markup=MAIN_REPLY_MARKUP
                 )
             except Exception as e:
                 logger.error(f"Error sending notification to user {user_id}: {e}")
 
     @rate_limit
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        keyboard = [
-            ['🛍 Ürün Takibi Başlat', '📋 Takip Listesi'],
-            ['ℹ️ Yardım', '📊 Durum']
-        ]
-        reply_markup = ReplyKeyboardMarkup(
-            keyboard,
-            resize_keyboard=True,
-            is_persistent=True,
-            one_time_keyboard=False
-        )
-        
         welcome_message = (
             "HoschelAI ile Ürün Takip Sistemine Hoş Geldiniz! 👋\n\n"
             "🛍️ Trendyol ürünlerinin fiyatlarını takip edebilir,\n"
             "📉 Fiyat düşüşlerinden anında haberdar olabilirsiniz.\n\n"
             "Aşağıdaki butonları kullanarak işlem yapabilirsiniz."
         )
-        await update.message.reply_text(welcome_message, reply_markup=reply_markup)
+        await update.message.reply_text(welcome_message, reply_markup=MAIN_REPLY_MARKUP)
 
     @rate_limit
     async def handle_buttons(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        text = update.message.text
-        
-        if text == '🛍 Ürün Takibi Başlat':
-            return await self.track(update, context)
-        elif text == '📋 Takip Listesi':
-            return await self.list_products(update, context)
-        elif text == 'ℹ️ Yardım':
-            return await self.help(update, context)
-        elif text == '📊 Durum':
-            return await self.status(update, context)
+        handler = self._button_handlers.get(update.message.text)
+        if handler:
+            return await handler(update, context)
 
     @rate_limit
     async def track(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -121,14 +174,7 @@ class ProductBot:
     async def url_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.info("Received URL input")
         url = update.message.text
-        if not url.startswith(('http://', 'https://')):
-            await update.message.reply_text(
-                "❌ Geçersiz URL. Lütfen geçerli bir Trendyol ürün linki girin."
-            )
-            return URL
-
-        # Check if URL is valid Trendyol URL
-        if not self.product_tracker._is_valid_trendyol_url(url):
+        if TRENDYOL_URL_RE.match(url) is None:
             logger.info(f"Invalid Trendyol URL: {url}")
             await update.message.reply_text(
                 "❌ Geçersiz Trendyol URL'i. Lütfen doğru bir ürün linki girin.\n"
@@ -137,7 +183,7 @@ class ProductBot:
             return URL
 
         # Try to get product details first
-        product_details = self.product_tracker.get_product_details(url)
+        product_details = await asyncio.to_thread(self.product_tracker.get_product_details, url)
         if not product_details:
             logger.error(f"Failed to get product details for URL: {url}")
             await update.message.reply_text(
@@ -149,7 +195,7 @@ class ProductBot:
         context.user_data['product_details'] = product_details
         
         try:
-            sizes = self.product_tracker.get_available_sizes(url)
+            sizes = product_details['available_sizes']
             logger.info(f"Found sizes for {url}: {sizes}")
 
             if sizes:
@@ -190,7 +236,8 @@ class ProductBot:
             logger.info(f"Processing size: {size} for URL: {url}")  # Debug log
             
             try:
-                product_details = self.product_tracker.add_tracking(
+                product_details = await asyncio.to_thread(
+                    self.product_tracker.add_tracking,
                     update.effective_user.id,
                     url,
                     size
@@ -199,24 +246,13 @@ class ProductBot:
                 logger.info(f"Product tracking added: {product_details}")  # Debug log
                 
                 # Return to main menu
-                keyboard = [
-                    ['🛍 Ürün Takibi Başlat', '📋 Takip Listesi'],
-                    ['ℹ️ Yardım', '📊 Durum']
-                ]
-                reply_markup = ReplyKeyboardMarkup(
-                    keyboard,
-                    resize_keyboard=True,
-                    is_persistent=True,
-                    one_time_keyboard=False
-                )
-                
                 await update.message.reply_text(
                     f"✅ Takip başlatıldı!\n\n"
                     f"📦 Ürün: {product_details['name']}\n"
                     f"📏 Beden: {size}\n"
                     f"💰 Mevcut fiyat: {product_details['price']:.2f}TL\n\n"
                     "🔔 Fiyat düştüğünde size haber vereceğim!",
-                    reply_markup=reply_markup
+                    reply_markup=MAIN_REPLY_MARKUP
                 )
                 
             except ValueError as ve:
@@ -236,87 +272,91 @@ class ProductBot:
 
     @rate_limit
     async def help(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        help_text = (
-            "📌 Nasıl Kullanılır?\n\n"
-            "1. '🛍 Ürün Takibi Başlat' butonuna tıklayın\n"
-            "2. Trendyol ürün linkini yapıştırın\n"
-            "3. İstediğiniz bedeni seçin\n"
-            "🔍 Diğer Komutlar:\n"
-            "📋 Takip Listesi - Takip ettiğiniz ürünleri görün\n"
-            "📊 Durum - Bot durumunu kontrol edin"
-        )
-        keyboard = [
-            ['🛍 Ürün Takibi Başlat', '📋 Takip Listesi'],
-            ['ℹ️ Yardım', '📊 Durum']
-        ]
-        reply_markup = ReplyKeyboardMarkup(
-            keyboard,
-            resize_keyboard=True,
-            is_persistent=True,
-            one_time_keyboard=False
-        )
-        await update.message.reply_text(help_text, reply_markup=reply_markup)
+        await update.message.reply_text(HELP_TEXT, reply_markup=MAIN_REPLY_MARKUP)
 
     @rate_limit
     async def list_products(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
-        products = self.db.get_user_products(user_id)
+        products = await asyncio.to_thread(self.db.get_user_products, user_id)
         
         if not products:
-            keyboard = [
-                ['🛍 Ürün Takibi Başlat', '📋 Takip Listesi'],
-                ['ℹ️ Yardım', '📊 Durum']
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-            
             await update.message.reply_text(
                 "📝 Henüz takip ettiğiniz bir ürün bulunmuyor.\n"
                 "Yeni bir ürün takibi başlatmak için '🛍 Ürün Takibi Başlat' butonunu kullanın.",
-                reply_markup=reply_markup
+                reply_markup=MAIN_REPLY_MARKUP
             )
             return
 
-        for product in products:
-            keyboard = [[
+        # Pack all products into as few messages as possible, one delete button per product
+        pages = []
+        message, keyboard = "", []
+        for index, product in enumerate(products, start=1):
+            entry = (
+                f"<b>{index}.</b> 📦 Ürün: {escape(product.product_name)}\n"
+                f"📏 Beden: {escape(product.size)}\n"
+                f"💳 Güncel fiyat: {product.last_price:.2f}TL\n"
+                f"🕒 Son kontrol: {product.last_check}\n"
+                f"🔗 Link: {escape(product.url)}\n\n"
+            )
+            if message and len(message) + len(entry) > MAX_MESSAGE_LENGTH:
+                pages.append((message.rstrip(), InlineKeyboardMarkup(keyboard)))
+                message, keyboard = "", []
+            message += entry
+            keyboard.append([
                 InlineKeyboardButton(
-                    "🗑 Takibi Durdur",
-                    callback_data=f"delete_{product['id']}"
+                    f"🗑 {index}. Takibi Durdur",
+                    callback_data=f"d{product.id}"
                 )
-            ]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            message = (
-                f"📦 Ürün: {product['product_name']}\n"
-                f"📏 Beden: {product['size']}\n"
-                f"💳 Güncel fiyat: {product['last_price']:.2f}TL\n"
-                f"🕒 Son kontrol: {product['last_check']}\n"
-                f"🔗 Link: {product['url']}"
-            )
-            
-            await update.message.reply_text(message, reply_markup=reply_markup)
+            ])
+        pages.append((message.rstrip(), InlineKeyboardMarkup(keyboard)))
+
+        # Send pages in order so the numbering reads top to bottom; one failed page shouldn't stop the rest
+        for message, reply_markup in pages:
+            try:
+                await update.message.reply_text(message, parse_mode='HTML', reply_markup=reply_markup)
+            except Exception as e:
+                logger.error(f"Error sending product list to user {user_id}: {e}")
 
     async def delete_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
-        await query.answer()
         
-        product_id = int(query.data.split('_')[1])
-        if self.db.delete_product(query.from_user.id, product_id):
-            await query.message.edit_text(
-                f"{query.message.text}\n\n❌ Takip durduruldu."
+        product_id = int(DELETE_CALLBACK_RE.match(query.data).group(1))
+        try:
+            removed = await asyncio.to_thread(
+                self.product_tracker.remove_tracking, query.from_user.id, product_id
+            )
+        except Exception as e:
+            logger.error(f"Error deleting product {product_id}: {e}")
+            removed = False
+
+        # Answer before editing so the button's spinner always stops
+        if not removed:
+            await query.answer("❌ Ürün takibi durdurulamadı.", show_alert=True)
+            return
+        await query.answer("❌ Takip durduruldu.")
+
+        # Drop only this product's button; the list text is untouched
+        keyboard = [
+            row for row in query.message.reply_markup.inline_keyboard
+            if row[0].callback_data != query.data
+        ]
+        try:
+            await query.edit_message_reply_markup(
+                reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
             )
-        else:
-            await query.message.reply_text("❌ Ürün takibi durdurulamadı.")
+        except telegram.error.TelegramError as e:
+            logger.warning(f"Could not update buttons after deleting product {product_id}: {e}")
 
     @rate_limit
     async def status(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
-        products = self.db.get_user_products(user_id)
+        product_count = await asyncio.to_thread(self.db.count_user_products, user_id)
         
         status_message = (
             "📊 Bot Durumu\n\n"
-            f"👤 Takip ettiğiniz ürün sayısı: {len(products)}\n"
+            f"👤 Takip ettiğiniz ürün sayısı: {product_count}\n"
             f"⚡ Bot durumu: Aktif\n"
-            f"🕒 Kontrol sıklığı: 15 dakika"
+            f"🕒 Kontrol sıklığı: 5 dakika - 6 saat (fiyat hareketine göre)"
         )
         
         await update.message.reply_text(status_message)
@@ -327,7 +367,8 @@ class ProductBot:
             product_id = int(context.args[0])
             threshold_price = float(context.args[1])
             
-            self.product_tracker.add_price_threshold(
+            await asyncio.to_thread(
+                self.product_tracker.add_price_threshold,
                 update.effective_user.id,
                 product_id,
                 threshold_price
@@ -345,7 +386,7 @@ class ProductBot:
     async def show_history(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
             product_id = int(context.args[0])
-            chart_data = self.product_tracker.get_price_history_chart(product_id)
+            chart_data = await asyncio.to_thread(self.product_tracker.get_price_history_chart, product_id)
             
             if chart_data:
                 await update.message.reply_photo(
@@ -370,7 +411,7 @@ class ProductBot:
             return
 
         product_name = ' '.join(context.args)
-        results = self.product_tracker.compare_prices(product_name)
+        results = await asyncio.to_thread(self.product_tracker.compare_prices, product_name)
         
         if not results:
             await update.message.reply_text(
@@ -390,23 +431,68 @@ class ProductBot:
 
         await update.message.reply_text(message)
 
-    def signal_handler(self, signum, frame):
-        """Handle shutdown signals gracefully"""
-        logger.info("Shutdown signal received. Cleaning up...")
+    async def _flush_user_stats(self):
+        """Periodically persist in-memory request counts to user_stats"""
+        while True:
+            await asyncio.sleep(STATS_FLUSH_INTERVAL)
+            pending = self.rate_limiter.drain_pending()
+            if pending:
+                try:
+                    await asyncio.to_thread(self.db.update_user_stats, pending)
+                except Exception as e:
+                    logger.error(f"Error flushing user stats: {e}")
+
+    async def prune_price_history(self, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            deleted = await asyncio.to_thread(self.db.prune_price_history, PRICE_HISTORY_KEEP_DAYS)
+            logger.info(f"Pruned {deleted} price history rows older than {PRICE_HISTORY_KEEP_DAYS} days")
+        except Exception as e:
+            logger.error(f"Error pruning price history: {e}")
+
+    async def post_init(self, application: Application):
+        self._app_loop = asyncio.get_running_loop()
+        self._stats_task = asyncio.create_task(self._flush_user_stats())
+
+    async def post_shutdown(self, application: Application):
+        """Release resources once polling has stopped and handlers have finished"""
+        logger.info("Shutting down. Cleaning up...")
         self.is_running = False
-        if self.application:
-            self.application.stop()
-        self.product_tracker.cleanup()
-        sys.exit(0)
+        if self._stats_task:
+            self._stats_task.cancel()
+        await asyncio.to_thread(self.product_tracker.cleanup)
+        await asyncio.to_thread(self.db.update_user_stats, self.rate_limiter.drain_pending())
+        self.db.close()
 
     def run(self):
         try:
-            # Set up signal handlers
-            signal.signal(signal.SIGINT, self.signal_handler)
-            signal.signal(signal.SIGTERM, self.signal_handler)
-
             self.is_running = True
-            self.application = Application.builder().token(TOKEN).build()
+            # Separate, larger HTTP pools so button presses don't wait on getUpdates
+            self.application = (
+                Application.builder()
+                .token(TOKEN)
+                .connection_pool_size(32)
+                .pool_timeout(30)
+                .connect_timeout(10)
+                .read_timeout(30)
+                .get_updates_connection_pool_size(4)
+                .get_updates_pool_timeout(30)
+                # Pace outgoing requests below Telegram's flood limits
+                .rate_limiter(AIORateLimiter(
+                    overall_max_rate=28,
+                    overall_time_period=1,
+                    group_max_rate=18,
+                    group_time_period=60
+                ))
+                .post_init(self.post_init)
+                .post_shutdown(self.post_shutdown)
+                .build()
+            )
+
+            self.application.job_queue.run_daily(
+                self.prune_price_history,
+                time=PRICE_HISTORY_PRUNE_TIME,
+                name="prune_price_history"
+            )
 
             # Add handlers in correct order
             self.application.add_handler(CommandHandler("start", self.start))
@@ -438,12 +524,16 @@ class ProductBot:
             self.application.add_handler(conv_handler)
             
             # Add callback query handler
-            self.application.add_handler(CallbackQueryHandler(self.delete_callback, pattern=r'^delete_'))
+            self.application.add_handler(CallbackQueryHandler(self.delete_callback, pattern=DELETE_CALLBACK_RE))
 
             logger.info("Starting bot...")
             self.application.run_polling(
-                allowed_updates=Update.ALL_TYPES,
-                stop_signals=[],
+                poll_interval=0.0,
+                timeout=30,
+                # Only request the update types the handlers above consume
+                allowed_updates=[Update.MESSAGE, Update.CALLBACK_QUERY],
+                drop_pending_updates=True,
+                stop_signals=[signal.SIGINT, signal.SIGTERM],
                 close_loop=False
             )
             
@@ -1,19 +1,68 @@
 import sqlite3
-from datetime import datetime
-from typing import List, Dict, Optional
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Tuple
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+@dataclass(slots=True)
+class TrackedProduct:
+    id: int
+    user_id: int
+    url: str
+    size: str
+    last_price: float
+    product_name: str
+    last_check: str
+    check_interval: int
+
+# Column order matches the TrackedProduct fields
+TRACKED_PRODUCT_COLUMNS = "id, user_id, url, size, last_price, product_name, last_check, check_interval"
+
+# Seconds between checks for a newly tracked product
+DEFAULT_CHECK_INTERVAL = 900
+
+# last_check and checked_at are shown to users and have always held local time, so they
+# are stamped with datetime('now', 'localtime'); scheduling and stats columns stay in UTC
+
 class Database:
     def __init__(self, db_path: str = "product_tracker.db"):
         self.db_path = db_path
+        # One long-lived connection shared by the bot and the tracker thread
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        self._conn.execute("PRAGMA mmap_size=268435456")
         self.initialize_db()
+        self._conn.execute("PRAGMA optimize")
+
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements atomically on the shared connection"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        """Close the shared connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
 
     def initialize_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
+        with self._transaction() as conn:
+            conn.execute(f"""
                 CREATE TABLE IF NOT EXISTS tracked_products (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     user_id INTEGER,
@@ -22,9 +71,21 @@ class Database:
                     last_price REAL,
                     product_name TEXT,
                     last_check TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    next_check_at TIMESTAMP,
+                    check_interval INTEGER DEFAULT {DEFAULT_CHECK_INTERVAL}
                 )
             """)
+
+            # Databases created before per-product scheduling lack these columns
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(tracked_products)")}
+            if 'next_check_at' not in columns:
+                conn.execute("ALTER TABLE tracked_products ADD COLUMN next_check_at TIMESTAMP")
+                conn.execute("UPDATE tracked_products SET next_check_at = CURRENT_TIMESTAMP")
+            if 'check_interval' not in columns:
+                conn.execute(
+                    f"ALTER TABLE tracked_products ADD COLUMN check_interval INTEGER DEFAULT {DEFAULT_CHECK_INTERVAL}"
+                )
             
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS price_history (
@@ -83,6 +144,34 @@ class Database:
                 )
             """)
 
+            # Indexes for the per-user list/delete lookups and history scans
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tracked_user ON tracked_products(user_id)")
+            # next_check_at is only read in a full scan at startup; an index would just slow price writes
+            conn.execute("DROP INDEX IF EXISTS idx_tracked_next_check")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_product ON price_history(product_id, checked_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_stats_last ON user_stats(last_request)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_thresholds_product ON price_thresholds(product_id)")
+
+            has_unique_index = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_tracked_user_url_size'"
+            ).fetchone()
+            if not has_unique_index:
+                # Drop duplicate subscriptions left over from before the unique index existed
+                duplicate_ids = [(row[0],) for row in conn.execute("""
+                    SELECT id FROM tracked_products WHERE id NOT IN (
+                        SELECT MIN(id) FROM tracked_products GROUP BY user_id, url, size
+                    )
+                """)]
+                if duplicate_ids:
+                    for table in ('price_history', 'price_thresholds', 'store_products'):
+                        conn.executemany(f"DELETE FROM {table} WHERE product_id = ?", duplicate_ids)
+                    conn.executemany("DELETE FROM tracked_products WHERE id = ?", duplicate_ids)
+                    logger.warning(f"Removed {len(duplicate_ids)} duplicate tracked products")
+                conn.execute("""
+                    CREATE UNIQUE INDEX ux_tracked_user_url_size
+                    ON tracked_products(user_id, url, size)
+                """)
+
             # Initialize supported stores
             stores = [
                 ('Trendyol', 'trendyol.com', '{"price": ".prc-dsc", "size": "div.sp-itm"}'),
@@ -95,91 +184,151 @@ class Database:
                 VALUES (?, ?, ?)
             """, stores)
 
-    def add_tracked_product(self, user_id: int, product_data: Dict) -> int:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO tracked_products 
-                (user_id, url, size, last_price, product_name, last_check)
-                VALUES (?, ?, ?, ?, ?, ?)
+        # Parse store selectors once; scrapers read them from here
+        self.store_selectors = self.load_store_selectors()
+
+    def load_store_selectors(self) -> Dict[str, Dict]:
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT name, selectors FROM supported_stores WHERE enabled = 1"
+            )
+            return {name: json.loads(selectors) for name, selectors in cursor}
+
+    def add_tracked_product(self, user_id: int, product_data: Dict) -> Optional[int]:
+        """Insert a tracked product, returning None if the user already tracks it"""
+        with self._lock:
+            cursor = self._conn.execute("""
+                INSERT OR IGNORE INTO tracked_products 
+                (user_id, url, size, last_price, product_name, last_check,
+                 next_check_at, check_interval)
+                VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime'), datetime('now', ?), ?)
             """, (
                 user_id,
                 product_data['url'],
                 product_data['size'],
                 product_data['last_price'],
                 product_data['product_name'],
-                datetime.now()
+                f'+{DEFAULT_CHECK_INTERVAL} seconds',
+                DEFAULT_CHECK_INTERVAL
             ))
-            return cursor.lastrowid
-
-    def get_user_products(self, user_id: int) -> List[Dict]:
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM tracked_products 
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def get_user_products(self, user_id: int) -> List[TrackedProduct]:
+        with self._lock:
+            cursor = self._conn.execute(f"""
+                SELECT {TRACKED_PRODUCT_COLUMNS} FROM tracked_products 
                 WHERE user_id = ? 
                 ORDER BY created_at DESC
             """, (user_id,))
-            return [dict(row) for row in cursor.fetchall()]
+            return [TrackedProduct(*row) for row in cursor]
+
+    def count_user_products(self, user_id: int) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT COUNT(*) FROM tracked_products WHERE user_id = ?", (user_id,)
+            )
+            return cursor.fetchone()[0]
 
     def delete_product(self, user_id: int, product_id: int) -> bool:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
+        with self._lock:
+            cursor = self._conn.execute("""
                 DELETE FROM tracked_products 
                 WHERE id = ? AND user_id = ?
             """, (product_id, user_id))
             return cursor.rowcount > 0
 
-    def update_product_price(self, product_id: int, new_price: float):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
+    def update_product_prices(self, updates: List[Tuple[int, float, int]]):
+        """Record a batch of (product_id, price, check_interval) checks in a single transaction"""
+        if not updates:
+            return
+        with self._transaction() as conn:
+            conn.executemany("""
                 UPDATE tracked_products 
-                SET last_price = ?, last_check = ? 
+                SET last_price = ?, last_check = datetime('now', 'localtime'),
+                    check_interval = ?, next_check_at = datetime('now', ?)
                 WHERE id = ?
-            """, (new_price, datetime.now(), product_id))
+            """, [
+                (price, interval, f'+{interval} seconds', product_id)
+                for product_id, price, interval in updates
+            ])
             
-            conn.execute("""
+            conn.executemany("""
                 INSERT INTO price_history (product_id, price, checked_at)
-                VALUES (?, ?, ?)
-            """, (product_id, new_price, datetime.now()))
-
-    def get_all_tracked_products(self) -> List[Dict]:
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM tracked_products")
-            return [dict(row) for row in cursor.fetchall()]
-
-    def update_user_stats(self, user_id: int):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            # First try to update existing record
-            cursor.execute("""
-                UPDATE user_stats 
-                SET request_count = CASE 
-                    WHEN last_request < datetime('now', '-1 minute') THEN 1 
-                    ELSE request_count + 1 
-                END,
-                last_request = datetime('now')
-                WHERE user_id = ?
-            """, (user_id,))
-            
-            # If no record exists, create new one
-            if cursor.rowcount == 0:
-                cursor.execute("""
-                    INSERT INTO user_stats (user_id, request_count, last_request)
-                    VALUES (?, 1, datetime('now'))
-                """, (user_id,))
-
-    def get_user_request_count(self, user_id: int, timeframe_minutes: int = 60) -> int:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT request_count FROM user_stats 
-                WHERE user_id = ? AND 
-                last_request > datetime('now', ?)
-            """, (user_id, f'-{timeframe_minutes} minutes'))
-            result = cursor.fetchone()
-            return result[0] if result else 0 
\ No newline at end of file
+                VALUES (?, ?, datetime('now', 'localtime'))
+            """, [(product_id, price) for product_id, price, _ in updates])
+
+    def reschedule_products(self, schedule: List[Tuple[int, int]]):
+        """Push back the next check of (product_id, delay_seconds) pairs without recording a price"""
+        if not schedule:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE tracked_products SET next_check_at = datetime('now', ?) WHERE id = ?",
+                [(f'+{delay} seconds', product_id) for product_id, delay in schedule]
+            )
+
+    def get_price_history(self, product_id: int) -> Tuple[List[str], List[float]]:
+        """Return a product's history as (checked_at, price) columns, oldest first"""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT checked_at, price FROM price_history
+                WHERE product_id = ?
+                ORDER BY checked_at
+            """, (product_id,)).fetchall()
+        if not rows:
+            return [], []
+        dates, prices = zip(*rows)
+        return list(dates), list(prices)
+
+    def prune_price_history(self, keep_days: int = 90) -> int:
+        """Delete price history older than keep_days and refresh planner statistics"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM price_history WHERE checked_at < datetime('now', 'localtime', ?)",
+                (f'-{keep_days} days',)
+            )
+        with self._lock:
+            self._conn.execute("ANALYZE")
+        return cursor.rowcount
+
+    def get_tracking_schedule(self) -> List[Tuple[TrackedProduct, float]]:
+        """Return every tracked product with the seconds until its next check (negative if overdue)"""
+        with self._lock:
+            cursor = self._conn.execute(f"""
+                SELECT {TRACKED_PRODUCT_COLUMNS},
+                    COALESCE((julianday(next_check_at) - julianday('now')) * 86400, 0)
+                FROM tracked_products
+            """)
+            return [(TrackedProduct(*row[:-1]), row[-1]) for row in cursor]
+
+    def get_thresholds_for_products(self, product_ids: List[int]) -> Dict[int, List[Dict]]:
+        """Fetch price thresholds for many products at once, keyed by product id"""
+        thresholds = {product_id: [] for product_id in product_ids}
+        if not product_ids:
+            return thresholds
+        placeholders = ', '.join('?' * len(product_ids))
+        with self._lock:
+            cursor = self._conn.execute(f"""
+                SELECT product_id, user_id, threshold_price FROM price_thresholds
+                WHERE product_id IN ({placeholders})
+            """, product_ids)
+            for product_id, user_id, threshold_price in cursor:
+                thresholds[product_id].append({
+                    'user_id': user_id,
+                    'threshold_price': threshold_price
+                })
+        return thresholds
+
+    def update_user_stats(self, request_counts: Dict[int, int]):
+        """Persist request counts accumulated in memory since the last flush"""
+        with self._transaction() as conn:
+            conn.executemany("""
+                INSERT INTO user_stats (user_id, request_count, last_request)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    request_count = CASE 
+                        WHEN last_request < datetime('now', '-1 minute') THEN excluded.request_count 
+                        ELSE request_count + excluded.request_count 
+                    END,
+                    last_request = CURRENT_TIMESTAMP
+            """, request_counts.items())
@@ -1,6 +1,10 @@
 import time
+import asyncio
 import threading
-from typing import Dict, List, Callable, Optional
+import weakref
+import heapq
+from typing import Dict, List, Callable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from msedge.selenium_tools import Edge, EdgeOptions
 from selenium.webdriver.common.by import By
@@ -11,15 +15,21 @@ from datetime import datetime, timedelta
 import re
 from retry import retry
 from cachetools import TTLCache
-from queue import Queue
-from database import Database
+from queue import Empty, LifoQueue, Queue
+from database import Database, TrackedProduct, DEFAULT_CHECK_INTERVAL
 from prometheus_client import Counter, Gauge, start_http_server
-from store_scrapers import ScraperFactory
-import matplotlib.pyplot as plt
+from store_scrapers import ScraperFactory, StoreScraper, PRICE_STRIP, PRICE_TRANS
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import aiohttp
+from bs4 import BeautifulSoup
 import io
+from html import escape
 import os
 import winreg
 import requests
+from requests.adapters import HTTPAdapter
 import psutil
 
 # Metrics
@@ -30,29 +40,343 @@ PRICE_DROPS = Counter('price_drops_total', 'Total number of price drops detected
 
 logger = logging.getLogger(__name__)
 
+# Trendyol product links look like https://www.trendyol.com/<brand>/<slug>-p-<id>
+TRENDYOL_URL_RE = re.compile(r'^https?://(?:[\w-]+\.)?trendyol\.com/[^/]+/[^/]+-p-\d+', re.IGNORECASE)
+
+# Upper bound on product pages fetched at the same time during a tracking cycle
+MAX_CONCURRENT_CHECKS = 20
+
+# Per-product check intervals adapt between these bounds (seconds)
+MIN_CHECK_INTERVAL = 300
+MAX_CHECK_INTERVAL = 6 * 3600
+# Most products checked in one pass of the tracking loop
+DUE_BATCH_SIZE = 50
+
+def _next_check_interval(product: TrackedProduct, price: float) -> int:
+    """Check moving prices sooner and stable ones less often"""
+    if price != product.last_price:
+        interval = product.check_interval // 2
+    else:
+        interval = product.check_interval * 2
+    return max(MIN_CHECK_INTERVAL, min(interval, MAX_CHECK_INTERVAL))
+
+# Selectors tried in order against the product page
+NAME_SELECTORS = [".pr-new-br", ".product-name", ".title"]
+PRICE_SELECTORS = [
+    ".prc-dsc",  # Normal price
+    ".prc-slg",  # Sale price
+    ".price-box"  # Alternative price class
+]
+SIZE_SELECTORS = [
+    "div.sp-itm:not(.so)",  # Regular size selector
+    "div.size-variant-wrapper:not(.disabled)",  # Alternative size selector
+    "div.variant-wrapper:not(.disabled)"  # Another variant
+]
+# All size variants matched in a single query
+SIZE_SELECTOR = ", ".join(SIZE_SELECTORS)
+# Any size option, in stock or not; its absence means the size list is rendered by JavaScript
+SIZE_CONTAINER_SELECTOR = "div.sp-itm, div.size-variant-wrapper, div.variant-wrapper"
+
+# Returns the first non-empty innerText for each selector list, in priority order
+_READ_PRODUCT_SCRIPT = """
+const first = (selectors) => {
+    for (const selector of selectors) {
+        const element = document.querySelector(selector);
+        const text = element && element.innerText.trim();
+        if (text) return text;
+    }
+    return null;
+};
+return {name: first(arguments[0]), price: first(arguments[1])};
+"""
+_READ_SIZES_SCRIPT = (
+    "return Array.from(document.querySelectorAll(arguments[0]))"
+    ".map(e => e.innerText.trim()).filter(Boolean);"
+)
+
+def _parse_price(price_text: str) -> Optional[float]:
+    try:
+        return float(price_text.strip(PRICE_STRIP).translate(PRICE_TRANS))
+    except ValueError:
+        return None
+
+class AsyncTrendyolFetcher:
+    """Fetches product pages over plain HTTP and parses them without a browser"""
+
+    HEADERS = {
+        'User-Agent': (
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+            '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0'
+        ),
+        'Accept-Language': 'tr-TR,tr;q=0.9'
+    }
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so the session binds to the tracker's event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=30),
+                headers=self.HEADERS,
+                timeout=aiohttp.ClientTimeout(total=20)
+            )
+        return self._session
+
+    async def get_product_details(self, url: str) -> Optional[Dict]:
+        """Return name, price and sizes, or None if the page lacks name or price"""
+        async with self._get_session().get(url) as response:
+            if response.status != 200:
+                logger.warning(f"Got HTTP {response.status} for {url}")
+                return None
+            html = await response.text()
+        # Parsing a full product page takes long enough to stall the other fetches on this loop
+        return await asyncio.to_thread(self.parse_product_page, html)
+
+    @staticmethod
+    def parse_product_page(html: str) -> Optional[Dict]:
+        """Return the product fields, or None if the static HTML lacks name or price
+
+        available_sizes is None when the page has no size options at all; Trendyol
+        usually renders them with JavaScript, so only a browser can read them.
+        """
+        soup = BeautifulSoup(html, "html.parser")
+
+        product_name = None
+        for selector in NAME_SELECTORS:
+            element = soup.select_one(selector)
+            if element and element.get_text(strip=True):
+                product_name = element.get_text(" ", strip=True)
+                break
+
+        price = None
+        for selector in PRICE_SELECTORS:
+            element = soup.select_one(selector)
+            if element:
+                price = _parse_price(element.get_text(strip=True))
+                if price:
+                    break
+
+        if not product_name or not price or price <= 0:
+            return None
+
+        sizes = None
+        if soup.select_one(SIZE_CONTAINER_SELECTOR) is not None:
+            sizes = [element.get_text(strip=True) for element in soup.select(SIZE_SELECTOR)]
+
+        return {
+            'name': product_name,
+            'price': price,
+            'available_sizes': sizes
+        }
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+# Price charts are drawn on one Agg-backed Figure per thread, outside pyplot's global state
+_chart_local = threading.local()
+
+def _chart_figure() -> Figure:
+    fig = getattr(_chart_local, 'figure', None)
+    if fig is None:
+        fig = _chart_local.figure = Figure(figsize=(10, 6))
+        FigureCanvasAgg(fig)
+    fig.clear()
+    return fig
+
+# Shared HTTP session for synchronous requests
+_HTTP = requests.Session()
+_HTTP.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# System requirement checks; each returns (status, lines to print)
+def _check_edge() -> Tuple[Dict[str, bool], List[str]]:
+    status = {'edge_browser': False, 'edge_driver': False, 'driver_version_match': False}
+    lines = []
+
+    # Check Edge browser
+    edge_version = None
+    try:
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Edge\BLBeacon") as key:
+            edge_version = winreg.QueryValueEx(key, "version")[0]
+            lines.append(f"✅ Microsoft Edge found: {edge_version}")
+            status['edge_browser'] = True
+    except Exception as e:
+        lines.append("❌ Microsoft Edge not found or version check failed")
+        lines.append(f"   Error: {str(e)}")
+
+    # Check EdgeDriver
+    driver = None
+    try:
+        driver = Edge(options=EdgeOptions())
+        driver_version = driver.capabilities['browserVersion']
+        lines.append(f"✅ EdgeDriver found: {driver_version}")
+        status['edge_driver'] = True
+        
+        # Check version match
+        if edge_version and edge_version.split('.')[0] == driver_version.split('.')[0]:
+            lines.append("✅ Edge and EdgeDriver versions match")
+            status['driver_version_match'] = True
+        else:
+            lines.append("❌ Version mismatch:")
+            lines.append(f"   Edge: {edge_version}")
+            lines.append(f"   Driver: {driver_version}")
+    except Exception as e:
+        lines.append("❌ EdgeDriver check failed")
+        lines.append(f"   Error: {str(e)}")
+    finally:
+        if driver:
+            driver.quit()
+
+    return status, lines
+
+def _check_permissions() -> Tuple[Dict[str, bool], List[str]]:
+    try:
+        test_file = "test_permissions.txt"
+        with open(test_file, 'w') as f:
+            f.write('test')
+        os.remove(test_file)
+        return {'permissions': True}, ["✅ File system permissions OK"]
+    except Exception as e:
+        return {'permissions': False}, ["❌ Permission check failed", f"   Error: {str(e)}"]
+
+def _check_network() -> Tuple[Dict[str, bool], List[str]]:
+    try:
+        # HEAD is enough to prove connectivity without downloading the homepage
+        response = _HTTP.head('https://www.trendyol.com', timeout=5, allow_redirects=True)
+        if response.status_code == 200:
+            return {'network': True}, ["✅ Network connection to Trendyol OK"]
+        return {'network': False}, [f"❌ Network check failed: Status code {response.status_code}"]
+    except Exception as e:
+        return {'network': False}, ["❌ Network check failed", f"   Error: {str(e)}"]
+
+def _check_memory() -> Tuple[Dict[str, bool], List[str]]:
+    try:
+        memory = psutil.virtual_memory()
+        available_gb = memory.available / (1024 * 1024 * 1024)
+        if available_gb > 1.0:
+            return {'memory': True}, [f"✅ Available memory: {available_gb:.1f}GB"]
+        return {'memory': False}, [f"❌ Low memory: {available_gb:.1f}GB available"]
+    except Exception as e:
+        return {'memory': False}, ["❌ Memory check failed", f"   Error: {str(e)}"]
+
+def check_system_requirements() -> bool:
+    """Check all requirements and return detailed status"""
+    print("\n🔍 Checking system requirements...")
+
+    # The checks are independent, so run them side by side and print in a fixed order
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(_check_edge),
+            executor.submit(_check_permissions),
+            executor.submit(_check_network),
+            executor.submit(_check_memory)
+        ]
+        results = [future.result() for future in futures]
+
+    status = {}
+    for check_status, lines in results:
+        status.update(check_status)
+        for line in lines:
+            print(line)
+
+    # Overall status
+    print("\n📊 System Status Summary:")
+    all_ok = all(status.values())
+    if all_ok:
+        print("✅ All checks passed! System ready.")
+    else:
+        print("❌ Some checks failed:")
+        for check, passed in status.items():
+            icon = "✅" if passed else "❌"
+            print(f"{icon} {check.replace('_', ' ').title()}")
+        
+        print("\n🔧 Recommended fixes:")
+        if not status['edge_browser']:
+            print("• Install Microsoft Edge browser")
+        if not status['edge_driver']:
+            print("• Download and install EdgeDriver from:")
+            print("  https://developer.microsoft.com/en-us/microsoft-edge/tools/webdriver/")
+        if not status['driver_version_match']:
+            print("• Update EdgeDriver to match your Edge browser version")
+        if not status['permissions']:
+            print("• Run the application with appropriate permissions")
+        if not status['network']:
+            print("• Check your internet connection")
+            print("• Verify if Trendyol is accessible")
+        if not status['memory']:
+            print("• Free up some system memory")
+            print("• Close unnecessary applications")
+
+    return all_ok
+
+# Drivers are replaced after this many uses or this many seconds to bound browser memory growth
+MAX_DRIVER_USES = 200
+MAX_DRIVER_AGE = 3600
+
 class DriverPool:
     def __init__(self, max_drivers: int = 3):
         self.max_drivers = max_drivers
-        self.drivers: Queue[Edge] = Queue()
+        # Each checked-out driver holds one permit, so at most max_drivers ever exist
+        self._sem = threading.BoundedSemaphore(max_drivers)
+        self._idle: LifoQueue = LifoQueue()
+        self._lock = threading.Lock()
         self.active_drivers = 0
 
     def get_driver(self) -> Edge:
+        self._sem.acquire()
         try:
-            if not self.drivers.empty():
-                return self.drivers.get()
-            
-            if self.active_drivers < self.max_drivers:
-                driver = self._create_driver()
-                self.active_drivers += 1
-                return driver
-            
-            return self.drivers.get()
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+
+        try:
+            driver = self._create_driver()
         except Exception as e:
+            self._sem.release()
             logger.error(f"Error getting driver: {e}")
             raise
+        driver._pool_created_at = time.monotonic()
+        driver._pool_uses = 0
+        with self._lock:
+            self.active_drivers += 1
+        ACTIVE_DRIVERS.inc()
+        return driver
 
     def return_driver(self, driver: Edge):
-        self.drivers.put(driver)
+        try:
+            driver._pool_uses += 1
+            expired = (
+                driver._pool_uses >= MAX_DRIVER_USES
+                or time.monotonic() - driver._pool_created_at > MAX_DRIVER_AGE
+            )
+            if expired or not self._reset_driver(driver):
+                # The next get_driver call starts a fresh one in its place
+                self._retire_driver(driver)
+            else:
+                self._idle.put(driver)
+        finally:
+            self._sem.release()
+
+    def _reset_driver(self, driver: Edge) -> bool:
+        """Clear per-page state between uses; False if the driver no longer responds"""
+        try:
+            driver.delete_all_cookies()
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to reset Edge driver: {e}")
+            return False
+
+    def _retire_driver(self, driver: Edge):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Error quitting Edge driver: {e}")
+        with self._lock:
+            self.active_drivers -= 1
+        ACTIVE_DRIVERS.dec()
 
     def _create_driver(self) -> Edge:
         try:
@@ -64,6 +388,18 @@ class DriverPool:
             options.add_argument('--disable-gpu')
             options.add_argument('--disable-extensions')
             options.add_argument('--disable-infobars')
+            # Turn off background services the scraper never uses to cut per-driver memory
+            options.add_argument('--disable-background-networking')
+            options.add_argument('--disable-component-update')
+            options.add_argument('--disable-default-apps')
+            options.add_argument('--disable-sync')
+            options.add_argument('--disable-translate')
+            options.add_argument('--metrics-recording-only')
+            options.add_argument('--mute-audio')
+            options.add_argument('--disable-features=TranslateUI,BlinkGenPropertyTrees')
+            # Only text nodes are read, so skip images and return at DOMContentLoaded
+            options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+            options.page_load_strategy = 'eager'
             
             # Add error handling for driver creation
             try:
@@ -79,19 +415,17 @@ class DriverPool:
             raise
 
     def cleanup(self):
-        while not self.drivers.empty():
-            driver = self.drivers.get()
-            driver.quit()
-            self.active_drivers -= 1
-            ACTIVE_DRIVERS.dec()
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except Empty:
+                break
+            self._retire_driver(driver)
 
 class ProductTracker:
     def __init__(self, notification_callback: Callable = None, db_path: str = "product_tracker.db"):
         print("\n🚀 Initializing Product Tracker...")
         
-        if not self.check_system_requirements():
-            raise SystemExit("System requirements not met. Please fix the issues above.")
-        
         self.notification_callback = notification_callback
         self.db = Database(db_path)
         
@@ -99,16 +433,40 @@ class ProductTracker:
         try:
             self.driver_pool = DriverPool()
             if not self.test_driver():
-                logger.error("Edge WebDriver test failed")
+                logger.error("Edge WebDriver test failed; run `python -m product_tracker --preflight` to diagnose")
                 raise Exception("Failed to initialize Edge WebDriver")
             logger.info("Edge WebDriver initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize driver pool: {e}")
             raise
 
-        self.cache = TTLCache(maxsize=100, ttl=300)
+        # Tracked products are read once; later additions and removals arrive through
+        # _tracking_changes and are applied by the tracking loop. Checks are scheduled
+        # per URL so every subscription to a product shares one fetch.
+        now = time.time()
+        self._subscriptions: Dict[str, Dict[int, TrackedProduct]] = {}
+        self._product_urls: Dict[int, str] = {}
+        self._url_due: Dict[str, float] = {}
+        for product, due_in in self.db.get_tracking_schedule():
+            self._subscriptions.setdefault(product.url, {})[product.id] = product
+            self._product_urls[product.id] = product.url
+            due = now + due_in
+            self._url_due[product.url] = min(due, self._url_due.get(product.url, due))
+        # (due, url) entries; an entry whose time no longer matches _url_due is stale
+        self._schedule: List[Tuple[float, str]] = [(due, url) for url, due in self._url_due.items()]
+        heapq.heapify(self._schedule)
+        self._tracking_changes: Queue = Queue()
+        self._schedule_changed = asyncio.Event()
+
+        # Product details by URL; many users often track the same product
+        self.cache = TTLCache(maxsize=max(1024, 4 * len(self._product_urls)), ttl=600)
+        self._url_locks = weakref.WeakValueDictionary()
+        self.fetcher = AsyncTrendyolFetcher()
         self.is_running = True
-        self.thread = threading.Thread(target=self._tracking_loop, daemon=True)
+        # The tracker owns an event loop in its own thread; HTTP fetches and the tracking loop run there
+        self._loop = asyncio.new_event_loop()
+        self._tracking_task = None
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
         
         # Start metrics server
         try:
@@ -118,64 +476,119 @@ class ProductTracker:
         
         self.thread.start()
 
-    @retry(WebDriverException, tries=3, delay=2, backoff=2)
-    def get_available_sizes(self, url: str) -> List[str]:
-        driver = None
+    def _read_sizes(self, driver) -> List[str]:
+        """Read the in-stock sizes from the page already loaded in driver"""
         try:
-            driver = self.driver_pool.get_driver()
-            driver.get(url)
+            # Wait for size options to load
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "div.sp-itm, div.size-variant-wrapper"))
+            )
+        except TimeoutException:
+            # If no size options found, return empty list
+            return []
+        
+        # Handle dynamic loading
+        self._scroll_page(driver)
+        
+        # Collect every size label in one script call rather than a .text round-trip per element
+        sizes = driver.execute_script(_READ_SIZES_SCRIPT, SIZE_SELECTOR)
+        logger.info(f"Found sizes: {sizes}")  # Debug log
+        return sizes
+
+    def _scroll_page(self, driver, max_scrolls: int = 3):
+        """Scroll to the bottom so lazily loaded size options render"""
+        for _ in range(max_scrolls):
+            # Scroll and read the new height in a single WebDriver call
+            height = driver.execute_script(
+                "window.scrollTo(0, document.body.scrollHeight); return document.body.scrollHeight;"
+            )
             try:
-                # Wait for size options to load
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "div.sp-itm, div.size-variant-wrapper"))
+                # Give lazily loaded content time to extend the page
+                WebDriverWait(driver, 2).until(
+                    lambda d: d.execute_script("return document.body.scrollHeight;") != height
                 )
             except TimeoutException:
-                # If no size options found, return empty list
-                return []
-            
-            # Handle dynamic loading
-            self._scroll_page(driver)
-            
-            # Try different size selectors
-            size_elements = []
-            selectors = [
-                "div.sp-itm:not(.so)",  # Regular size selector
-                "div.size-variant-wrapper:not(.disabled)",  # Alternative size selector
-                "div.variant-wrapper:not(.disabled)"  # Another variant
-            ]
-            
-            for selector in selectors:
-                size_elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                if size_elements:
-                    break
-            
-            sizes = [size.text.strip() for size in size_elements]
-            logger.info(f"Found sizes: {sizes}")  # Debug log
-            
+                break  # Nothing more loaded
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._tracking_task = self._loop.create_task(self._tracking_loop())
+        self._loop.run_forever()
+        self._loop.close()
+
+    def get_product_details(self, url: str) -> Optional[Dict]:
+        """Blocking wrapper around get_product_details_async for callers outside the tracker loop"""
+        # The bot offers the available sizes to choose from, so they must be read
+        details = asyncio.run_coroutine_threadsafe(
+            self.get_product_details_async(url, need_sizes=True), self._loop
+        ).result()
+        # The tracking loop counts its own checks in bulk; on-demand lookups count here
+        if details:
             SCRAPE_COUNTER.inc()
-            return sizes
-        except Exception as e:
+        else:
             SCRAPE_ERROR_COUNTER.inc()
-            logger.error(f"Error getting sizes from Trendyol: {e}")
-            return []
-        finally:
-            if driver:
-                self.driver_pool.return_driver(driver)
+        return details
+
+    async def get_product_details_async(self, url: str, fresh_after: Optional[datetime] = None,
+                                        need_sizes: bool = False) -> Optional[Dict]:
+        """Return product details, reusing a cached copy unless it was fetched before fresh_after
+
+        Without need_sizes, available_sizes may be None if only a browser could read them.
+        """
+        def cached() -> Optional[Dict]:
+            details = self.cache.get(url)
+            if (details
+                    and (fresh_after is None or details['last_checked'] >= fresh_after)
+                    and (not need_sizes or details['available_sizes'] is not None)):
+                return details
+            return None
 
-    def _scroll_page(self, driver):
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        while True:
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                break
-            last_height = new_height
+        details = cached()
+        if details:
+            return details
 
-    @retry(WebDriverException, tries=3, delay=2, backoff=2)
-    def get_product_details(self, url: str) -> Optional[Dict]:
+        # Concurrent callers for the same URL share a single fetch
+        lock = self._url_locks.get(url)
+        if lock is None:
+            lock = self._url_locks[url] = asyncio.Lock()
+        async with lock:
+            details = cached()
+            if details:
+                return details
+            details = await self._fetch_product_details(url, need_sizes)
+            if details:
+                self.cache[url] = details
+            return details
+
+    async def _fetch_product_details(self, url: str, need_sizes: bool = False) -> Optional[Dict]:
         logger.info(f"Getting product details for URL: {url}")
-        
+
+        if not url:
+            logger.error("Empty URL provided")
+            return None
+
+        if need_sizes:
+            # Sizes are almost always rendered by JavaScript, so go straight to the browser
+            return await asyncio.to_thread(self._get_product_details_selenium, url)
+
+        try:
+            details = await self.fetcher.get_product_details(url)
+        except Exception as e:
+            # Network, decoding and parsing errors alike fall back to the browser
+            logger.warning(f"HTTP fetch failed for {url}: {e}")
+            details = None
+
+        if details is None:
+            # Page needs JavaScript to render the fields; fall back to the browser
+            logger.info(f"Falling back to WebDriver for {url}")
+            return await asyncio.to_thread(self._get_product_details_selenium, url)
+
+        details['last_checked'] = datetime.now()
+        logger.info(f"Successfully got product details: {details}")
+        return details
+
+    @retry(WebDriverException, tries=3, delay=2, backoff=2)
+    def _get_product_details_selenium(self, url: str) -> Optional[Dict]:
         if not url:
             logger.error("Empty URL provided")
             return None
@@ -195,32 +608,24 @@ class ProductTracker:
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
 
-            # Try multiple selectors for product name
-            product_name = None
-            name_selectors = ["pr-new-br", "product-name", "title"]
-            for selector in name_selectors:
-                try:
-                    element = driver.find_element(By.CLASS_NAME, selector)
-                    product_name = element.text.strip()
-                    if product_name:
-                        break
-                except:
-                    continue
+            # Read name and price in one script call instead of a find_element per selector
+            texts = driver.execute_script(_READ_PRODUCT_SCRIPT, NAME_SELECTORS, PRICE_SELECTORS)
 
+            product_name = texts.get('name')
             if not product_name:
                 logger.error("Could not find product name")
                 return None
 
-            # Try multiple selectors for price
-            price = self._extract_price(driver)
-            if price <= 0:
+            price = _parse_price(texts.get('price') or '')
+            if not price or price <= 0:
                 logger.error("Could not find valid price")
                 return None
 
             details = {
                 'name': product_name,
                 'price': price,
-                'available_sizes': self.get_available_sizes(url),
+                # Reuse the driver we hold; checking out a second one could exhaust the pool
+                'available_sizes': self._read_sizes(driver),
                 'last_checked': datetime.now()
             }
             
@@ -246,30 +651,6 @@ class ProductTracker:
         except TimeoutException:
             return "N/A"
 
-    def _extract_price(self, driver) -> float:
-        try:
-            # Try different price selectors
-            price_selectors = [
-                "prc-dsc",  # Normal price
-                "prc-slg",  # Sale price
-                "price-box"  # Alternative price class
-            ]
-            
-            for selector in price_selectors:
-                try:
-                    price_element = driver.find_element(By.CLASS_NAME, selector)
-                    price_text = price_element.text.strip()
-                    price_text = price_text.replace('TL', '').replace('.', '').replace(',', '.').strip()
-                    return float(price_text)
-                except:
-                    continue
-                    
-            raise ValueError("No valid price found")
-            
-        except Exception as e:
-            logging.error(f"Error extracting price: {e}")
-            return 0.0
-
     def add_tracking(self, user_id: int, url: str, size: str) -> Dict:
         if not self._is_valid_trendyol_url(url):
             raise ValueError("Geçersiz Trendyol URL'i")
@@ -285,87 +666,207 @@ class ProductTracker:
             'product_name': initial_details['name']
         }
         
-        self.db.add_tracked_product(user_id, product_data)
+        product_id = self.db.add_tracked_product(user_id, product_data)
+        if product_id is None:
+            raise ValueError("Bu ürün ve beden zaten takip ediliyor")
+        self._push_tracking_change(product_id, TrackedProduct(
+            product_id, user_id, url, size, product_data['last_price'],
+            product_data['product_name'], None, DEFAULT_CHECK_INTERVAL
+        ))
         return initial_details
 
-    def _is_valid_trendyol_url(self, url: str) -> bool:
-        try:
-            pattern = r'trendyol\.com/.*?/.*?-p-[0-9]+'
-            return bool(re.search(pattern, url.lower()))
-        except:
-            logger.error(f"Error validating URL: {url}")
+    def remove_tracking(self, user_id: int, product_id: int) -> bool:
+        if not self.db.delete_product(user_id, product_id):
             return False
+        self._push_tracking_change(product_id, None)
+        return True
+
+    def _push_tracking_change(self, product_id: int, product: Optional[TrackedProduct]):
+        """Queue an added (product) or removed (None) subscription and wake the tracking loop"""
+        self._tracking_changes.put((product_id, product))
+        self._loop.call_soon_threadsafe(self._schedule_changed.set)
+
+    def _apply_tracking_changes(self):
+        while True:
+            try:
+                product_id, product = self._tracking_changes.get_nowait()
+            except Empty:
+                return
+            if product is None:
+                url = self._product_urls.pop(product_id, None)
+                if url is None:
+                    continue
+                subscriptions = self._subscriptions[url]
+                del subscriptions[product_id]
+                if not subscriptions:
+                    # The URL's heap entry is skipped once it comes due
+                    del self._subscriptions[url]
+                    del self._url_due[url]
+            else:
+                self._product_urls[product_id] = product.url
+                self._subscriptions.setdefault(product.url, {})[product_id] = product
+                # A new subscription to an already tracked URL joins that URL's schedule
+                if product.url not in self._url_due:
+                    self._schedule_url(product.url, time.time() + product.check_interval)
+
+    def _schedule_url(self, url: str, due: float):
+        self._url_due[url] = due
+        heapq.heappush(self._schedule, (due, url))
+
+    def _is_valid_trendyol_url(self, url: str) -> bool:
+        return TRENDYOL_URL_RE.match(url) is not None
+
+    async def _tracking_loop(self):
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHECKS)
+
+        async def check(url: str, products: List[TrackedProduct],
+                        thresholds: Dict[int, List[Dict]]) -> Optional[float]:
+            async with semaphore:
+                return await self._check_url(url, products, thresholds)
 
-    def _tracking_loop(self):
         while self.is_running:
             try:
-                products = self.db.get_all_tracked_products()
-                for product in products:
-                    if not self.is_running:
-                        break
-                    self._check_product(product)
-                time.sleep(900)  # 15 dakika
+                self._schedule_changed.clear()
+                self._apply_tracking_changes()
+
+                now = time.time()
+                urls = []
+                while self._schedule and self._schedule[0][0] <= now and len(urls) < DUE_BATCH_SIZE:
+                    due, url = heapq.heappop(self._schedule)
+                    if self._url_due.get(url) == due:
+                        urls.append(url)
+                groups = [list(self._subscriptions[url].values()) for url in urls]
+
+                # One query for every product's thresholds instead of one per product. Database
+                # calls run in a thread: they may wait on the bot's lock and must not stall fetches
+                thresholds = await asyncio.to_thread(
+                    self.db.get_thresholds_for_products,
+                    [product.id for products in groups for product in products]
+                )
+                results = await asyncio.gather(
+                    *(check(url, products, thresholds) for url, products in zip(urls, groups)),
+                    return_exceptions=True
+                )
+
+                price_updates = []
+                retries = []
+                error_count = 0
+                now = time.time()
+                for url, products, result in zip(urls, groups, results):
+                    if isinstance(result, Exception):
+                        logger.error(f"Error checking {url}: {result}")
+                    if isinstance(result, Exception) or result is None:
+                        # Keep the interval, but don't pick the URL straight back up
+                        error_count += 1
+                        interval = min(product.check_interval for product in products)
+                        retries.extend((product.id, interval) for product in products)
+                    else:
+                        # All subscriptions to a URL share its schedule; the most eager one sets it
+                        interval = min(_next_check_interval(product, result) for product in products)
+                        for product in products:
+                            product.check_interval = interval
+                            product.last_price = result
+                            price_updates.append((product.id, result, interval))
+                    self._schedule_url(url, now + interval)
+                # Persist the batch's prices and schedules in one transaction so restarts resume them
+                await asyncio.to_thread(self.db.update_product_prices, price_updates)
+                await asyncio.to_thread(self.db.reschedule_products, retries)
+                # One locked increment per metric per batch instead of one per URL
+                SCRAPE_COUNTER.inc(len(urls) - error_count)
+                SCRAPE_ERROR_COUNTER.inc(error_count)
+
+                # Sleep until the next URL is due or a subscription is added
+                delay = self._schedule[0][0] - time.time() if self._schedule else DEFAULT_CHECK_INTERVAL
+                try:
+                    await asyncio.wait_for(self._schedule_changed.wait(), timeout=max(delay, 0))
+                except asyncio.TimeoutError:
+                    pass
             except Exception as e:
                 logger.error(f"Error in tracking loop: {e}")
-                if not self.is_running:
-                    break
-                time.sleep(60)  # Wait before retrying
-
-    def _check_product(self, product: Dict):
-        details = self.get_product_details(product['url'])
+                await asyncio.sleep(60)  # Wait before retrying
+
+    async def _check_url(self, url: str, products: List[TrackedProduct],
+                         thresholds: Dict[int, List[Dict]]) -> Optional[float]:
+        """Fetch a URL once for all its subscriptions and return the price, or None if it could not be read"""
+        # Scheduled checks need a fresh price for the interval to adapt; only reuse
+        # a fetch of the same URL that finished while this check was waiting
+        details = await self.get_product_details_async(url, fresh_after=datetime.now())
         if not details:
-            return
+            return None
+
+        if details['available_sizes'] is None and any(
+            details['price'] < product.last_price and product.size.lower() != 'hepsi'
+            for product in products
+        ):
+            # The size filter needs the rendered size list; load it only now that the price dropped
+            details = await self.get_product_details_async(
+                url, fresh_after=details['last_checked'], need_sizes=True
+            )
+            if not details:
+                return None
+
+        for product in products:
+            self._notify_changes(product, details, thresholds[product.id])
+        return details['price']
 
+    def _notify_changes(self, product: TrackedProduct, details: Dict, thresholds: List[Dict]):
         current_price = details['price']
-        last_price = product['last_price']
-        
-        # Check price thresholds
-        thresholds = self.db.get_product_thresholds(product['id'])
+        last_price = product.last_price
+
+        # Notify only when the price crosses a threshold, not on every check below it
         for threshold in thresholds:
-            if current_price <= threshold['threshold_price']:
+            if current_price <= threshold['threshold_price'] < last_price:
                 self._notify_threshold_reached(
                     threshold['user_id'],
-                    product['product_name'],
-                    product['url'],
+                    product.product_name,
+                    product.url,
                     threshold['threshold_price'],
                     current_price
                 )
 
-        # Check stock status
-        if details['is_available'] and not product.get('was_available', True):
-            self._notify_stock_available(
-                product['user_id'],
-                product['product_name'],
-                product['url']
-            )
-
         if current_price < last_price:
-            if (product['size'].lower() == 'hepsi' or 
-                product['size'] in details['available_sizes']):
-                
+            # Sizes are only left unread when no specific-size subscription saw a drop
+            if (product.size.lower() == 'hepsi' or
+                product.size in details['available_sizes']):
+
                 PRICE_DROPS.inc()
                 self._notify_price_drop(
-                    product['user_id'],
-                    product['product_name'],
-                    product['url'],
+                    product.user_id,
+                    product.product_name,
+                    product.url,
                     last_price,
                     current_price,
                     details['available_sizes']
                 )
 
-        self.db.update_product_price(product['id'], current_price)
-
     def _notify_price_drop(self, user_id: int, product_name: str, url: str, 
-                          old_price: float, new_price: float, available_sizes: List[str]):
+                          old_price: float, new_price: float, available_sizes: Optional[List[str]]):
         if self.notification_callback:
+            # Sizes aren't read for all-size subscriptions unless the static page had them
+            sizes_line = (
+                f"📏 Mevcut bedenler: {escape(', '.join(available_sizes))}\n"
+                if available_sizes is not None else ""
+            )
             message = (
                 f"🔔 FİYAT DÜŞTÜ!\n\n"
-                f"📦 Ürün: {product_name}\n"
+                f"📦 Ürün: {escape(product_name)}\n"
                 f"💰 Eski fiyat: {old_price:.2f} TL\n"
                 f"🏷 Yeni fiyat: {new_price:.2f} TL\n"
                 f"📉 İndirim: {((old_price - new_price) / old_price * 100):.1f}%\n"
-                f"📏 Mevcut bedenler: {', '.join(available_sizes)}\n\n"
-                f"🛍 Ürün linki: {url}"
+                f"{sizes_line}\n"
+                f"🛍 Ürün linki: {escape(url)}"
+            )
+            self.notification_callback(user_id, message)
+
+    def _notify_threshold_reached(self, user_id: int, product_name: str, url: str,
+                                  threshold_price: float, current_price: float):
+        if self.notification_callback:
+            message = (
+                f"🎯 HEDEF FİYATA ULAŞILDI!\n\n"
+                f"📦 Ürün: {escape(product_name)}\n"
+                f"🎯 Hedef fiyat: {threshold_price:.2f} TL\n"
+                f"🏷 Güncel fiyat: {current_price:.2f} TL\n\n"
+                f"🛍 Ürün linki: {escape(url)}"
             )
             self.notification_callback(user_id, message)
 
@@ -373,28 +874,34 @@ class ProductTracker:
         self.db.add_threshold(user_id, product_id, threshold_price)
 
     def get_price_history_chart(self, product_id: int) -> Optional[bytes]:
-        history = self.db.get_price_history(product_id)
-        if not history:
+        dates, prices = self.db.get_price_history(product_id)
+        if not prices:
             return None
 
-        dates = [h['checked_at'] for h in history]
-        prices = [h['price'] for h in history]
+        # Contiguous arrays let Agg draw the line without walking Python lists
+        dates = np.array(dates, dtype='datetime64[s]')
+        prices = np.fromiter(prices, dtype=np.float32, count=len(prices))
 
-        plt.figure(figsize=(10, 6))
-        plt.plot(dates, prices)
-        plt.title('Fiyat Geçmişi')
-        plt.xlabel('Tarih')
-        plt.ylabel('Fiyat (TL)')
-        plt.xticks(rotation=45)
-        plt.grid(True)
+        fig = _chart_figure()
+        ax = fig.subplots()
+        ax.plot(dates, prices)
+        ax.set_title('Fiyat Geçmişi')
+        ax.set_xlabel('Tarih')
+        ax.set_ylabel('Fiyat (TL)')
+        ax.tick_params(axis='x', labelrotation=45)
+        ax.grid(True)
 
         buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plt.close()
-
+        fig.canvas.print_png(buf)
         return buf.getvalue()
 
+    def get_store_scraper(self, store_name: str, driver) -> Optional[StoreScraper]:
+        """Build a scraper for an enabled store from the selectors parsed at startup"""
+        selectors = self.db.store_selectors.get(store_name)
+        if selectors is None:
+            return None
+        return ScraperFactory.get_scraper(store_name, driver, selectors)
+
     def compare_prices(self, product_name: str) -> List[Dict]:
         stores = self.db.get_enabled_stores()
         results = []
@@ -416,8 +923,15 @@ class ProductTracker:
         logger.info("Cleaning up ProductTracker...")
         self.is_running = False
         
-        # Wait for tracking loop to finish current iteration
-        if self.thread.is_alive():
+        # Stop the tracking loop and close the HTTP session on the tracker's own loop
+        if hasattr(self, '_loop') and self._loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown_async(), self._loop).result(timeout=30)
+            except Exception as e:
+                logger.error(f"Error stopping tracking loop: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+        if hasattr(self, 'thread') and self.thread.is_alive():
             self.thread.join(timeout=30)
         
         # Clean up driver pool
@@ -426,6 +940,15 @@ class ProductTracker:
         
         logger.info("ProductTracker cleanup completed.")
 
+    async def _shutdown_async(self):
+        if self._tracking_task:
+            self._tracking_task.cancel()
+            try:
+                await self._tracking_task
+            except asyncio.CancelledError:
+                pass
+        await self.fetcher.close()
+
     def __del__(self):
         """Ensure cleanup on object destruction"""
         self.cleanup()
@@ -444,115 +967,14 @@ class ProductTracker:
             if driver:
                 self.driver_pool.return_driver(driver)
 
-    def check_system_requirements(self):
-        """Check all requirements and return detailed status"""
-        status = {
-            'edge_browser': False,
-            'edge_driver': False,
-            'driver_version_match': False,
-            'permissions': False,
-            'network': False,
-            'memory': False
-        }
-        
-        print("\n🔍 Checking system requirements...")
-        
-        # Check Edge browser
-        try:
-            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Edge\BLBeacon") as key:
-                edge_version = winreg.QueryValueEx(key, "version")[0]
-                print("✅ Microsoft Edge found:", edge_version)
-                status['edge_browser'] = True
-        except Exception as e:
-            print("❌ Microsoft Edge not found or version check failed")
-            print(f"   Error: {str(e)}")
-
-        # Check EdgeDriver
-        try:
-            driver = None
-            driver = Edge(options=EdgeOptions())
-            driver_version = driver.capabilities['browserVersion']
-            print(f"✅ EdgeDriver found: {driver_version}")
-            status['edge_driver'] = True
-            
-            # Check version match
-            if edge_version.split('.')[0] == driver_version.split('.')[0]:
-                print("✅ Edge and EdgeDriver versions match")
-                status['driver_version_match'] = True
-            else:
-                print("❌ Version mismatch:")
-                print(f"   Edge: {edge_version}")
-                print(f"   Driver: {driver_version}")
-        except Exception as e:
-            print("❌ EdgeDriver check failed")
-            print(f"   Error: {str(e)}")
-        finally:
-            if driver:
-                driver.quit()
+if __name__ == '__main__':
+    import argparse
 
-        # Check permissions
-        try:
-            test_file = "test_permissions.txt"
-            with open(test_file, 'w') as f:
-                f.write('test')
-            os.remove(test_file)
-            print("✅ File system permissions OK")
-            status['permissions'] = True
-        except Exception as e:
-            print("❌ Permission check failed")
-            print(f"   Error: {str(e)}")
-
-        # Check network
-        try:
-            response = requests.get('https://www.trendyol.com', timeout=5)
-            if response.status_code == 200:
-                print("✅ Network connection to Trendyol OK")
-                status['network'] = True
-            else:
-                print(f"❌ Network check failed: Status code {response.status_code}")
-        except Exception as e:
-            print("❌ Network check failed")
-            print(f"   Error: {str(e)}")
+    parser = argparse.ArgumentParser(description="Product tracker utilities")
+    parser.add_argument('--preflight', action='store_true',
+                        help="check Edge, EdgeDriver, permissions, network and memory, then exit")
+    args = parser.parse_args()
 
-        # Check available memory
-        try:
-            memory = psutil.virtual_memory()
-            available_gb = memory.available / (1024 * 1024 * 1024)
-            if available_gb > 1.0:
-                print(f"✅ Available memory: {available_gb:.1f}GB")
-                status['memory'] = True
-            else:
-                print(f"❌ Low memory: {available_gb:.1f}GB available")
-        except Exception as e:
-            print("❌ Memory check failed")
-            print(f"   Error: {str(e)}")
-
-        # Overall status
-        print("\n📊 System Status Summary:")
-        all_ok = all(status.values())
-        if all_ok:
-            print("✅ All checks passed! System ready.")
-        else:
-            print("❌ Some checks failed:")
-            for check, passed in status.items():
-                icon = "✅" if passed else "❌"
-                print(f"{icon} {check.replace('_', ' ').title()}")
-            
-            print("\n🔧 Recommended fixes:")
-            if not status['edge_browser']:
-                print("• Install Microsoft Edge browser")
-            if not status['edge_driver']:
-                print("• Download and install EdgeDriver from:")
-                print("  https://developer.microsoft.com/en-us/microsoft-edge/tools/webdriver/")
-            if not status['driver_version_match']:
-                print("• Update EdgeDriver to match your Edge browser version")
-            if not status['permissions']:
-                print("• Run the application with appropriate permissions")
-            if not status['network']:
-                print("• Check your internet connection")
-                print("• Verify if Trendyol is accessible")
-            if not status['memory']:
-                print("• Free up some system memory")
-                print("• Close unnecessary applications")
-
-        return all_ok 
\ No newline at end of file
+    if args.preflight:
+        raise SystemExit(0 if check_system_requirements() else 1)
+    parser.print_help()
@@ -3,15 +3,24 @@ from typing import Dict, List, Optional
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Turkish prices look like "1.299,99 TL": strip the currency, drop thousands dots, use a decimal point
+PRICE_STRIP = 'TL \t\n'
+PRICE_TRANS = str.maketrans({'.': '', ',': '.'})
+
 class StoreScraper(ABC):
     def __init__(self, driver, selectors: Dict):
+        # Selectors arrive already parsed (see ProductTracker.get_store_scraper)
         self.driver = driver
-        self.selectors = json.loads(selectors)
+        self.selectors = selectors
+        self._sizes_cache: Optional[List[str]] = None
+
+    def invalidate(self):
+        """Forget cached page data; call after loading a new page in the driver"""
+        self._sizes_cache = None
 
     @abstractmethod
     def get_price(self) -> float:
@@ -21,9 +30,10 @@ class StoreScraper(ABC):
     def get_sizes(self) -> List[str]:
         pass
 
-    @abstractmethod
     def is_in_stock(self) -> bool:
-        pass
+        # Reuse sizes already read from this page instead of querying the driver again
+        sizes = self._sizes_cache if self._sizes_cache is not None else self.get_sizes()
+        return len(sizes) > 0
 
 class TrendyolScraper(StoreScraper):
     def get_price(self) -> float:
@@ -31,8 +41,7 @@ class TrendyolScraper(StoreScraper):
             price_elem = WebDriverWait(self.driver, 10).until(
                 EC.presence_of_element_located((By.CLASS_NAME, "prc-dsc"))
             )
-            price_text = price_elem.text.strip()
-            return float(price_text.replace('TL', '').replace('.', '').replace(',', '.'))
+            return float(price_elem.text.strip(PRICE_STRIP).translate(PRICE_TRANS))
         except Exception as e:
             logger.error(f"Error getting Trendyol price: {e}")
             return 0.0
@@ -40,22 +49,19 @@ class TrendyolScraper(StoreScraper):
     def get_sizes(self) -> List[str]:
         try:
             size_elements = self.driver.find_elements(By.CSS_SELECTOR, "div.sp-itm:not(.so)")
-            return [size.text.strip() for size in size_elements]
+            self._sizes_cache = [size.text.strip() for size in size_elements]
+            return self._sizes_cache
         except Exception as e:
             logger.error(f"Error getting Trendyol sizes: {e}")
             return []
 
-    def is_in_stock(self) -> bool:
-        return len(self.get_sizes()) > 0
-
 class BershkaScraper(StoreScraper):
     def get_price(self) -> float:
         try:
             price_elem = WebDriverWait(self.driver, 10).until(
                 EC.presence_of_element_located((By.CLASS_NAME, "current-price-elem"))
             )
-            price_text = price_elem.text.strip()
-            return float(price_text.replace('TL', '').replace('.', '').replace(',', '.'))
+            return float(price_elem.text.strip(PRICE_STRIP).translate(PRICE_TRANS))
         except Exception as e:
             logger.error(f"Error getting Bershka price: {e}")
             return 0.0
@@ -63,21 +69,19 @@ class BershkaScraper(StoreScraper):
     def get_sizes(self) -> List[str]:
         try:
             size_elements = self.driver.find_elements(By.CSS_SELECTOR, ".size-selector-option:not(.disabled)")
-            return [size.text.strip() for size in size_elements]
+            self._sizes_cache = [size.text.strip() for size in size_elements]
+            return self._sizes_cache
         except Exception as e:
             logger.error(f"Error getting Bershka sizes: {e}")
             return []
 
-    def is_in_stock(self) -> bool:
-        return len(self.get_sizes()) > 0
-
 class ZaraScraper(StoreScraper):
     # Similar implementation for Zara
     pass
 
 class ScraperFactory:
     @staticmethod
-    def get_scraper(store_name: str, driver, selectors: str) -> Optional[StoreScraper]:
+    def get_scraper(store_name: str, driver, selectors: Dict) -> Optional[StoreScraper]:
         scrapers = {
             'Trendyol': TrendyolScraper,
             'Bershka': BershkaScraper,